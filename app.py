@@ -1,17 +1,36 @@
 """Tkinter interface for browsing legal cases stored in the SQLite database."""
 from __future__ import annotations
 
+import bisect
+import queue
 import sqlite3
+import threading
 import tkinter as tk
+from contextlib import contextmanager
 from tkinter import messagebox, ttk
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Sequence
+from typing import Iterable, Iterator, Sequence
+
+from build_db import configure_connection
 
 DATABASE_PATH = Path("db.sqlite3")
+# Number of read-only connections kept by Database.
+READER_POOL_SIZE = 4
+# Number of process rows inserted into the Treeview at a time.
+PROCESS_PAGE_SIZE = 500
+
 
+@dataclass(slots=True)
+class ProcessSummary:
+    """Columns of a process shown in the process list."""
 
-@dataclass
+    id: int
+    number: str
+    title: str
+
+
+@dataclass(slots=True)
 class ProcessRecord:
     """Representation of a process stored in the database."""
 
@@ -21,7 +40,7 @@ class ProcessRecord:
     pdf_path: str
 
 
-@dataclass
+@dataclass(slots=True)
 class EventRecord:
     """Representation of a process event."""
 
@@ -31,17 +50,20 @@ class EventRecord:
     description: str
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentRecord:
-    """Representation of a document stored in the database."""
+    """Representation of a document stored in the database.
+
+    The document text is not included; it is loaded on demand through
+    :meth:`Database.fetch_document_content`.
+    """
 
     id: int
     process_id: int
     file_name: str
-    content: str
 
 
-@dataclass
+@dataclass(slots=True)
 class AppointmentRecord:
     """Representation of an appointment associated with a process."""
 
@@ -53,104 +75,144 @@ class AppointmentRecord:
 
 
 class Database:
-    """Simple wrapper around SQLite operations used by the UI."""
-
-    def __init__(self, database_path: Path) -> None:
-        self._conn = sqlite3.connect(database_path)
-        self._conn.row_factory = sqlite3.Row
+    """Simple wrapper around SQLite operations used by the UI.
+
+    Writes go through a single writer connection while reads check out one
+    of several read-only connections, so with WAL enabled readers never
+    wait on the writer.
+    """
+
+    def __init__(self, database_path: Path, readers: int = READER_POOL_SIZE) -> None:
+        self._writer = self._connect(str(database_path))
+        reader_uri = f"{database_path.resolve().as_uri()}?mode=ro"
+        self._readers: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(readers):
+            self._readers.put(self._connect(reader_uri, read_only=True))
+        self._local = threading.local()
+
+    @staticmethod
+    def _connect(database: str, read_only: bool = False) -> sqlite3.Connection:
+        connection = sqlite3.connect(database, uri=read_only, check_same_thread=False)
+        configure_connection(connection, read_only=read_only)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """Check out a read-only connection, reusing the one already held by this thread."""
+
+        held = getattr(self._local, "reader", None)
+        if held is not None:
+            yield held
+            return
+        connection = self._readers.get()
+        self._local.reader = connection
+        try:
+            yield connection
+        finally:
+            self._local.reader = None
+            self._readers.put(connection)
+
+    def fetch_process_summaries(self) -> list[ProcessSummary]:
+        with self._reader() as connection:
+            cursor = connection.execute(
+                "SELECT id, number, title FROM processes ORDER BY title"
+            )
+            return [ProcessSummary(*row) for row in cursor.fetchall()]
 
-    def fetch_processes(self) -> list[ProcessRecord]:
-        cursor = self._conn.execute(
-            "SELECT id, number, title, pdf_path FROM processes ORDER BY title"
-        )
-        return [
-            ProcessRecord(
-                id=row["id"],
-                number=row["number"],
-                title=row["title"],
-                pdf_path=row["pdf_path"],
+    def fetch_process(self, process_id: int) -> ProcessRecord | None:
+        with self._reader() as connection:
+            cursor = connection.execute(
+                "SELECT id, number, title, pdf_path FROM processes WHERE id = ?",
+                (process_id,),
             )
-            for row in cursor.fetchall()
-        ]
+            row = cursor.fetchone()
+            return ProcessRecord(*row) if row is not None else None
 
     def fetch_events(self, process_id: int) -> list[EventRecord]:
-        cursor = self._conn.execute(
-            """
-            SELECT id, process_id, event_date, description
-            FROM events
-            WHERE process_id = ?
-            ORDER BY event_date DESC
-            """,
-            (process_id,),
-        )
-        return [
-            EventRecord(
-                id=row["id"],
-                process_id=row["process_id"],
-                event_date=row["event_date"],
-                description=row["description"],
+        with self._reader() as connection:
+            cursor = connection.execute(
+                """
+                SELECT id, process_id, event_date, description
+                FROM events
+                WHERE process_id = ?
+                ORDER BY event_date DESC
+                """,
+                (process_id,),
+            )
+            return [EventRecord(*row) for row in cursor.fetchall()]
+
+    def fetch_document_headers(self, process_id: int) -> list[DocumentRecord]:
+        with self._reader() as connection:
+            cursor = connection.execute(
+                """
+                SELECT id, process_id, file_name
+                FROM documents
+                WHERE process_id = ?
+                ORDER BY id DESC
+                """,
+                (process_id,),
             )
-            for row in cursor.fetchall()
-        ]
+            return [DocumentRecord(*row) for row in cursor.fetchall()]
 
-    def fetch_documents(self, process_id: int) -> list[DocumentRecord]:
-        cursor = self._conn.execute(
-            """
-            SELECT id, process_id, file_name, content
-            FROM documents
-            WHERE process_id = ?
-            ORDER BY id DESC
-            """,
-            (process_id,),
-        )
-        return [
-            DocumentRecord(
-                id=row["id"],
-                process_id=row["process_id"],
-                file_name=row["file_name"],
-                content=row["content"],
+    def fetch_document_content(self, document_id: int) -> str:
+        with self._reader() as connection:
+            cursor = connection.execute(
+                "SELECT content FROM documents WHERE id = ?",
+                (document_id,),
             )
-            for row in cursor.fetchall()
-        ]
+            row = cursor.fetchone()
+            return row["content"] if row is not None else ""
 
     def fetch_appointments(self, process_id: int) -> list[AppointmentRecord]:
-        cursor = self._conn.execute(
-            """
-            SELECT id, process_id, title, start_at, notes
-            FROM appointments
-            WHERE process_id = ?
-            ORDER BY start_at
-            """,
-            (process_id,),
-        )
-        return [
-            AppointmentRecord(
-                id=row["id"],
-                process_id=row["process_id"],
-                title=row["title"],
-                start_at=row["start_at"],
-                notes=row["notes"],
+        with self._reader() as connection:
+            cursor = connection.execute(
+                """
+                SELECT id, process_id, title, start_at, notes
+                FROM appointments
+                WHERE process_id = ?
+                ORDER BY start_at
+                """,
+                (process_id,),
+            )
+            return [AppointmentRecord(*row) for row in cursor.fetchall()]
+
+    def fetch_process_bundle(
+        self, process_id: int
+    ) -> tuple[list[EventRecord], list[DocumentRecord], list[AppointmentRecord]]:
+        """Return events, documents and appointments of a process.
+
+        The three queries share a single read transaction, so they see one
+        consistent snapshot of the database.
+        """
+
+        with self._reader() as connection, connection:
+            connection.execute("BEGIN")
+            return (
+                self.fetch_events(process_id),
+                self.fetch_document_headers(process_id),
+                self.fetch_appointments(process_id),
             )
-            for row in cursor.fetchall()
-        ]
 
     def add_appointment(self, process_id: int, title: str, start_at: str, notes: str) -> int:
-        cursor = self._conn.execute(
+        cursor = self._writer.execute(
             """
             INSERT INTO appointments (process_id, title, start_at, notes)
             VALUES (?, ?, ?, ?)
             """,
             (process_id, title, start_at, notes or None),
         )
-        self._conn.commit()
+        self._writer.commit()
         return int(cursor.lastrowid)
 
     def delete_appointment(self, appointment_id: int) -> None:
-        self._conn.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
-        self._conn.commit()
+        self._writer.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
+        self._writer.commit()
 
     def close(self) -> None:
-        self._conn.close()
+        self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
 
 
 class CaseManagerApp:
@@ -162,8 +224,15 @@ class CaseManagerApp:
         self.selected_process: ProcessRecord | None = None
         self.selected_document: DocumentRecord | None = None
         self.selected_appointment: AppointmentRecord | None = None
-        self._process_cache: list[ProcessRecord] = []
+        self._process_cache: list[ProcessSummary] = []
+        self._next_offset = 0
         self._documents_cache: list[DocumentRecord] = []
+        self._appointments_cache: list[AppointmentRecord] = []
+        self._appointments_by_id: dict[int, AppointmentRecord] = {}
+        # Rows currently shown in each Treeview, keyed by iid.
+        self._processes_displayed: dict[str, tuple[str, ...]] = {}
+        self._events_displayed: dict[str, tuple[str, ...]] = {}
+        self._appointments_displayed: dict[str, tuple[str, ...]] = {}
 
         self.root.title("Gestor de Processos")
         self.root.geometry("1100x700")
@@ -187,6 +256,7 @@ class CaseManagerApp:
         self.process_tree.heading("title", text="Título")
         self.process_tree.column("number", width=200)
         self.process_tree.column("title", width=300)
+        self.process_tree.configure(yscrollcommand=self._on_process_scroll)
         self.process_tree.bind("<<TreeviewSelect>>", self._on_process_select)
         main_paned.add(self.process_tree, weight=1)
 
@@ -281,27 +351,66 @@ class CaseManagerApp:
     # ------------------------------------------------------------------
     # Data population helpers
     # ------------------------------------------------------------------
+    @staticmethod
+    def _sync_tree(
+        tree: ttk.Treeview,
+        displayed: dict[str, tuple[str, ...]],
+        rows: Sequence[tuple[str, tuple[str, ...]]],
+    ) -> dict[str, tuple[str, ...]]:
+        """Make ``tree`` show ``rows`` touching only the items that changed.
+
+        ``displayed`` maps the iids currently in the tree to their values and
+        ``rows`` lists the wanted ``(iid, values)`` pairs in display order.
+        Returns the new mapping of displayed rows.
+        """
+
+        wanted = dict(rows)
+        stale = [iid for iid in displayed if iid not in wanted]
+        if stale:
+            tree.delete(*stale)
+        for index, (iid, values) in enumerate(rows):
+            if iid not in displayed:
+                tree.insert("", index, iid=iid, values=values)
+                continue
+            if displayed[iid] != values:
+                tree.item(iid, values=values)
+            if tree.index(iid) != index:
+                tree.move(iid, "", index)
+        return wanted
+
+    @staticmethod
+    def _appointment_values(appointment: AppointmentRecord) -> tuple[str, ...]:
+        return (appointment.title, appointment.start_at, appointment.notes or "")
+
     def _populate_processes(self) -> None:
-        for item in self.process_tree.get_children():
-            self.process_tree.delete(item)
-        self._process_cache = self.db.fetch_processes()
-        for process in self._process_cache:
-            self.process_tree.insert("", tk.END, iid=str(process.id), values=(process.number, process.title))
+        self._process_cache = self.db.fetch_process_summaries()
+        page = self._process_cache[:PROCESS_PAGE_SIZE]
+        self._processes_displayed = self._sync_tree(
+            self.process_tree,
+            self._processes_displayed,
+            [(str(process.id), (process.number, process.title)) for process in page],
+        )
+        self._next_offset = len(page)
         if self.process_tree.get_children():
             first_item = self.process_tree.get_children()[0]
             self.process_tree.selection_set(first_item)
             self.process_tree.focus(first_item)
 
+    def _insert_next_process_page(self) -> None:
+        page = self._process_cache[self._next_offset : self._next_offset + PROCESS_PAGE_SIZE]
+        for process in page:
+            iid = str(process.id)
+            values = (process.number, process.title)
+            self.process_tree.insert("", tk.END, iid=iid, values=values)
+            self._processes_displayed[iid] = values
+        self._next_offset += len(page)
+
     def _populate_events(self, events: Iterable[EventRecord]) -> None:
-        for item in self.events_tree.get_children():
-            self.events_tree.delete(item)
-        for event in events:
-            self.events_tree.insert(
-                "",
-                tk.END,
-                iid=str(event.id),
-                values=(event.event_date, event.description),
-            )
+        self._events_displayed = self._sync_tree(
+            self.events_tree,
+            self._events_displayed,
+            [(str(event.id), (event.event_date, event.description)) for event in events],
+        )
 
     def _populate_documents(self, documents: Sequence[DocumentRecord]) -> None:
         self.document_list.delete(0, tk.END)
@@ -315,33 +424,33 @@ class CaseManagerApp:
             self._clear_document_text()
 
     def _populate_appointments(self, appointments: Sequence[AppointmentRecord]) -> None:
-        for item in self.appointments_tree.get_children():
-            self.appointments_tree.delete(item)
-        for appointment in appointments:
-            self.appointments_tree.insert(
-                "",
-                tk.END,
-                iid=str(appointment.id),
-                values=(appointment.title, appointment.start_at, appointment.notes or ""),
-            )
+        self._appointments_displayed = self._sync_tree(
+            self.appointments_tree,
+            self._appointments_displayed,
+            [(str(appt.id), self._appointment_values(appt)) for appt in appointments],
+        )
+        self._appointments_cache = list(appointments)
+        self._appointments_by_id = {appt.id: appt for appt in self._appointments_cache}
         self.selected_appointment = None
 
     # ------------------------------------------------------------------
     # Event handlers
     # ------------------------------------------------------------------
+    def _on_process_scroll(self, first: str, last: str) -> None:  # noqa: ARG002 - required signature
+        # Load the next page once the user scrolls close to the end of the list.
+        if float(last) >= 0.9 and self._next_offset < len(self._process_cache):
+            self._insert_next_process_page()
+
     def _on_process_select(self, event: tk.Event[tk.Misc]) -> None:  # noqa: ARG002 - required signature
         selection = self.process_tree.selection()
         if not selection:
             return
         process_id = int(selection[0])
-        processes = {proc.id: proc for proc in self._process_cache}
-        process = processes.get(process_id)
+        process = self.db.fetch_process(process_id)
         if process is None:
             return
         self.selected_process = process
-        events = self.db.fetch_events(process_id)
-        documents = self.db.fetch_documents(process_id)
-        appointments = self.db.fetch_appointments(process_id)
+        events, documents, appointments = self.db.fetch_process_bundle(process_id)
         self._populate_events(events)
         self._populate_documents(documents)
         self._populate_appointments(appointments)
@@ -359,10 +468,7 @@ class CaseManagerApp:
         if not selection:
             self.selected_appointment = None
             return
-        appointment_id = int(selection[0])
-        appointments = self.db.fetch_appointments(self.selected_process.id) if self.selected_process else []
-        lookup = {appt.id: appt for appt in appointments}
-        self.selected_appointment = lookup.get(appointment_id)
+        self.selected_appointment = self._appointments_by_id.get(int(selection[0]))
 
     # ------------------------------------------------------------------
     # Document helpers
@@ -370,7 +476,7 @@ class CaseManagerApp:
     def _show_document_text(self, document: DocumentRecord) -> None:
         self.document_text.configure(state=tk.NORMAL)
         self.document_text.delete("1.0", tk.END)
-        self.document_text.insert(tk.END, document.content)
+        self.document_text.insert(tk.END, self.db.fetch_document_content(document.id))
         self.document_text.configure(state=tk.DISABLED)
 
     def _clear_document_text(self) -> None:
@@ -401,8 +507,24 @@ class CaseManagerApp:
             start_at=start_at,
             notes=notes,
         )
-        self._populate_appointments(self.db.fetch_appointments(self.selected_process.id))
-        self.appointments_tree.selection_set(str(appointment_id))
+        appointment = AppointmentRecord(
+            appointment_id,
+            self.selected_process.id,
+            title,
+            start_at,
+            notes or None,
+        )
+        # Mirror the ORDER BY start_at of fetch_appointments without re-querying.
+        index = bisect.bisect_right(
+            self._appointments_cache, start_at, key=lambda appt: appt.start_at
+        )
+        iid = str(appointment_id)
+        values = self._appointment_values(appointment)
+        self._appointments_cache.insert(index, appointment)
+        self._appointments_by_id[appointment_id] = appointment
+        self._appointments_displayed[iid] = values
+        self.appointments_tree.insert("", index, iid=iid, values=values)
+        self.appointments_tree.selection_set(iid)
         self.title_entry.delete(0, tk.END)
         self.start_entry.delete(0, tk.END)
         self.notes_text.delete("1.0", tk.END)
@@ -420,11 +542,14 @@ class CaseManagerApp:
         )
         if not confirm:
             return
-        self.db.delete_appointment(self.selected_appointment.id)
-        if self.selected_process:
-            self._populate_appointments(
-                self.db.fetch_appointments(self.selected_process.id)
-            )
+        appointment = self.selected_appointment
+        self.db.delete_appointment(appointment.id)
+        iid = str(appointment.id)
+        self._appointments_cache.remove(appointment)
+        self._appointments_by_id.pop(appointment.id, None)
+        self._appointments_displayed.pop(iid, None)
+        self.appointments_tree.delete(iid)
+        self.selected_appointment = None
 
 
 def main() -> None:
@@ -4,20 +4,54 @@ from __future__ import annotations
 import argparse
 import datetime as dt
 import json
+import os
 import re
 import shutil
 import sqlite3
 import subprocess
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, Iterator, List, Sequence
+from typing import Deque, Dict, Iterable, Iterator, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+# Maps a process number to its ``(id, title, pdf_path)`` row.
+KnownProcesses = Dict[str, Tuple[int, str, str]]
 
 PROCESS_NUMBER_RE = re.compile(
-    r"\b\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4}\b"
+    r"\b\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4}\b",
+    flags=re.ASCII,
 )
 MOVEMENT_RE = re.compile(
     r"^(?P<date>\d{2}/\d{2}/\d{4})\s+-\s+(?P<description>.+)$",
     flags=re.MULTILINE,
 )
+# Fallback used when no movement matches: a date without the dash.
+FALLBACK_MOVEMENT_RE = re.compile(
+    r"^(?P<date>\d{2}/\d{2}/\d{4})\s+(?P<description>.*)$",
+    flags=re.MULTILINE,
+)
+# Number of PDFs converted and written to the database per transaction.
+IMPORT_BATCH_SIZE = 200
+# Number of leading characters searched first for the process number.
+CASE_NUMBER_SCAN_LIMIT = 200_000
+# Number of leading characters searched for the document title.
+TITLE_SCAN_LIMIT = 4096
+# Conservative bound on host parameters per statement (SQLite < 3.32 limit).
+SQLITE_MAX_VARIABLES = 999
+# PRAGMAs that are safe on read-only connections.
+READ_PRAGMAS = (
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    *READ_PRAGMAS,
+    "PRAGMA foreign_keys=ON",
+)
 
 
 class BuildDbError(Exception):
@@ -55,16 +89,16 @@ class PdfImportResult:
         )
 
 
-def extract_text_from_pdf(pdf_path: Path, destination: Path) -> str:
+def extract_text_from_pdf(pdf_path: Path) -> str:
     """Extract text from *pdf_path* using the ``pdftotext`` command.
 
+    The text is streamed through ``pdftotext``'s standard output, so no
+    temporary file is written.
+
     Parameters
     ----------
     pdf_path:
-        The path to the PDF file that should be converted into a text file.
-    destination:
-        Path where the temporary text file will be stored. The file will be
-        removed after its content is read.
+        The path to the PDF file that should be converted into text.
 
     Returns
     -------
@@ -77,10 +111,9 @@ def extract_text_from_pdf(pdf_path: Path, destination: Path) -> str:
         If ``pdftotext`` is not available or the conversion fails.
     """
 
-    destination.parent.mkdir(parents=True, exist_ok=True)
     try:
-        subprocess.run(
-            ["pdftotext", str(pdf_path), str(destination)],
+        completed = subprocess.run(
+            ["pdftotext", "-enc", "UTF-8", str(pdf_path), "-"],
             check=True,
             capture_output=True,
         )
@@ -93,15 +126,19 @@ def extract_text_from_pdf(pdf_path: Path, destination: Path) -> str:
             f"Falha ao converter '{pdf_path.name}' para texto: {exc.stderr!r}"
         ) from exc
 
-    text = destination.read_text(encoding="utf-8", errors="ignore")
-    destination.unlink(missing_ok=True)
-    return text
+    return completed.stdout.decode("utf-8", errors="ignore")
 
 
 def _parse_case_number(text: str) -> str:
-    """Return the first process number found in ``text``."""
+    """Return the first process number found in ``text``.
+
+    The number normally sits in the header, so the first
+    ``CASE_NUMBER_SCAN_LIMIT`` characters are searched before the full text.
+    """
 
-    match = PROCESS_NUMBER_RE.search(text)
+    match = PROCESS_NUMBER_RE.search(text, 0, CASE_NUMBER_SCAN_LIMIT)
+    if not match and len(text) > CASE_NUMBER_SCAN_LIMIT:
+        match = PROCESS_NUMBER_RE.search(text)
     if not match:
         raise BuildDbError(
             "Não foi possível identificar o número do processo no documento."
@@ -115,35 +152,57 @@ def _parse_events(text: str) -> List[tuple[str, str]]:
     events = [(m.group("date"), m.group("description").strip()) for m in MOVEMENT_RE.finditer(text)]
     if events:
         return events
-
-    # Fallback: attempt to detect lines containing a date without the dash.
-    fallback_events: List[tuple[str, str]] = []
-    date_re = re.compile(r"^(\d{2}/\d{2}/\d{4})\s+(.*)$", flags=re.MULTILINE)
-    for match in date_re.finditer(text):
-        fallback_events.append((match.group(1), match.group(2).strip()))
-    return fallback_events
+    return [
+        (m.group("date"), m.group("description").strip())
+        for m in FALLBACK_MOVEMENT_RE.finditer(text)
+    ]
 
 
 def _derive_title(text: str) -> str:
-    """Return a user friendly title for the process."""
+    """Return a user friendly title for the process.
+
+    The title is always near the top of the document, so only the first
+    ``TITLE_SCAN_LIMIT`` characters (extended to the end of the line they
+    cut) are split into lines; the whole text is scanned only when that
+    head is blank.
+    """
 
-    for line in text.splitlines():
+    end = text.find("\n", TITLE_SCAN_LIMIT)
+    head = text if end == -1 else text[:end]
+    lines = head.splitlines() if head.strip() else text.splitlines()
+    for line in lines:
         cleaned = line.strip()
         if cleaned:
             return cleaned[:200]
     return "Processo sem título"
 
 
-def process_pdf(pdf_path: Path, storage_dir: Path, temp_dir: Path) -> PdfImportResult:
+def _store_pdf(pdf_path: Path, target_path: Path) -> None:
+    """Place ``pdf_path`` at ``target_path`` with as little IO as possible.
+
+    Nothing is done when both paths already refer to the same file. Otherwise
+    a hard link is attempted, falling back to a copy when the paths live on
+    different filesystems or links are unsupported.
+    """
+
+    if target_path.exists():
+        if os.path.samefile(pdf_path, target_path):
+            return
+        target_path.unlink()
+    try:
+        os.link(pdf_path, target_path)
+    except OSError:
+        shutil.copy2(pdf_path, target_path)
+
+
+def process_pdf(pdf_path: Path, storage_dir: Path) -> PdfImportResult:
     """Process the given PDF, importing it to the storage directory."""
 
     storage_dir.mkdir(parents=True, exist_ok=True)
     target_path = storage_dir / pdf_path.name
-    if pdf_path.resolve() != target_path.resolve():
-        shutil.copy2(pdf_path, target_path)
+    _store_pdf(pdf_path, target_path)
 
-    text_destination = temp_dir / f"{pdf_path.stem}.txt"
-    text_content = extract_text_from_pdf(target_path, text_destination)
+    text_content = extract_text_from_pdf(target_path)
 
     process_number = _parse_case_number(text_content)
     events = _parse_events(text_content)
@@ -164,6 +223,17 @@ def _iter_pdf_files(directory: Path) -> Iterator[Path]:
             yield path
 
 
+def configure_connection(connection: sqlite3.Connection, read_only: bool = False) -> None:
+    """Apply the performance related PRAGMAs to ``connection``.
+
+    Read-only connections only get ``READ_PRAGMAS``: switching the journal
+    mode needs write access, and the other writer settings do not apply.
+    """
+
+    for pragma in READ_PRAGMAS if read_only else CONNECTION_PRAGMAS:
+        connection.execute(pragma)
+
+
 def ensure_schema(connection: sqlite3.Connection) -> None:
     """Create database tables when they do not exist."""
 
@@ -203,12 +273,50 @@ def ensure_schema(connection: sqlite3.Connection) -> None:
             notes TEXT,
             FOREIGN KEY(process_id) REFERENCES processes(id) ON DELETE CASCADE
         );
+
+        CREATE INDEX IF NOT EXISTS idx_events_process
+            ON events(process_id, event_date DESC);
+        CREATE INDEX IF NOT EXISTS idx_documents_process
+            ON documents(process_id, id DESC);
+        CREATE INDEX IF NOT EXISTS idx_appointments_process
+            ON appointments(process_id, start_at);
         """
     )
     connection.commit()
 
 
-def _get_process_id(connection: sqlite3.Connection, process_number: str, title: str, pdf_path: Path) -> int:
+def _load_known_processes(connection: sqlite3.Connection) -> KnownProcesses:
+    """Return ``number -> (id, title, pdf_path)`` for every stored process."""
+
+    cursor = connection.execute("SELECT number, id, title, pdf_path FROM processes")
+    return {number: (process_id, title, pdf_path) for number, process_id, title, pdf_path in cursor}
+
+
+def _get_process_id(
+    connection: sqlite3.Connection,
+    known: KnownProcesses,
+    process_number: str,
+    title: str,
+    pdf_path: Path,
+    created_at: str,
+) -> int:
+    """Return the id of ``process_number``, creating or updating the row.
+
+    ``known`` is consulted first so already imported processes cost at most
+    an ``UPDATE`` when their title or path changed; it is kept up to date.
+    """
+
+    entry = known.get(process_number)
+    if entry is not None:
+        process_id, known_title, known_path = entry
+        if (known_title, known_path) != (title, str(pdf_path)):
+            connection.execute(
+                "UPDATE processes SET title = ?, pdf_path = ? WHERE id = ?",
+                (title, str(pdf_path), process_id),
+            )
+            known[process_number] = (process_id, title, str(pdf_path))
+        return process_id
+
     cursor = connection.cursor()
     cursor.execute(
         """
@@ -217,88 +325,160 @@ def _get_process_id(connection: sqlite3.Connection, process_number: str, title:
         ON CONFLICT(number) DO UPDATE SET
             title = excluded.title,
             pdf_path = excluded.pdf_path
+        RETURNING id
         """,
         (
             process_number,
             title,
             str(pdf_path),
-            dt.datetime.utcnow().isoformat(),
+            created_at,
         ),
     )
-    connection.commit()
-    cursor.execute(
-        "SELECT id FROM processes WHERE number = ?",
-        (process_number,),
-    )
     row = cursor.fetchone()
     if row is None:  # pragma: no cover - defensive
         raise BuildDbError("Falha ao obter o ID do processo recém-criado.")
-    return int(row[0])
+    process_id = int(row[0])
+    known[process_number] = (process_id, title, str(pdf_path))
+    return process_id
 
 
-def persist_import_results(
+def _delete_existing_rows(cursor: sqlite3.Cursor, process_ids: Sequence[int]) -> None:
+    """Remove previous events/documents of ``process_ids`` for a clean import."""
+
+    for start in range(0, len(process_ids), SQLITE_MAX_VARIABLES):
+        chunk = process_ids[start : start + SQLITE_MAX_VARIABLES]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"DELETE FROM events WHERE process_id IN ({placeholders})", chunk)
+        cursor.execute(f"DELETE FROM documents WHERE process_id IN ({placeholders})", chunk)
+
+
+def _chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yield successive lists of at most ``size`` elements from ``items``."""
+
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _persist_batch(
     connection: sqlite3.Connection,
-    results: Iterable[PdfImportResult],
+    batch: Sequence[PdfImportResult],
+    known: KnownProcesses,
+    now: str,
 ) -> None:
-    """Persist the provided import results into the database."""
+    """Write one batch of import results; the caller owns the transaction."""
 
-    for result in results:
+    # Keyed by process so a later PDF for the same number replaces the
+    # data of an earlier one.
+    results_by_process: dict[int, PdfImportResult] = {}
+    for result in batch:
         process_id = _get_process_id(
             connection,
+            known,
             process_number=result.process_number,
             title=result.title,
             pdf_path=result.stored_path,
+            created_at=now,
         )
+        results_by_process[process_id] = result
 
-        cursor = connection.cursor()
-        # Remove previous events/documents for a clean import.
-        cursor.execute("DELETE FROM events WHERE process_id = ?", (process_id,))
-        cursor.execute("DELETE FROM documents WHERE process_id = ?", (process_id,))
-
-        event_rows = [
-            (process_id, event_date, description)
-            for event_date, description in result.events
-        ]
-        if event_rows:
-            cursor.executemany(
-                "INSERT INTO events (process_id, event_date, description) VALUES (?, ?, ?)",
-                event_rows,
-            )
+    if not results_by_process:
+        return
 
-        cursor.execute(
-            """
-            INSERT INTO documents (process_id, file_name, content, created_at)
-            VALUES (?, ?, ?, ?)
-            """,
-            (
-                process_id,
-                result.stored_path.name,
-                result.document_text,
-                dt.datetime.utcnow().isoformat(),
-            ),
+    all_events = [
+        (process_id, event_date, description)
+        for process_id, result in results_by_process.items()
+        for event_date, description in result.events
+    ]
+    all_documents = [
+        (
+            process_id,
+            result.stored_path.name,
+            result.document_text,
+            now,
         )
-        connection.commit()
+        for process_id, result in results_by_process.items()
+    ]
 
+    cursor = connection.cursor()
+    _delete_existing_rows(cursor, list(results_by_process))
+    cursor.executemany(
+        "INSERT INTO events (process_id, event_date, description) VALUES (?, ?, ?)",
+        all_events,
+    )
+    cursor.executemany(
+        """
+        INSERT INTO documents (process_id, file_name, content, created_at)
+        VALUES (?, ?, ?, ?)
+        """,
+        all_documents,
+    )
 
-def load_pdf_results(pdf_dir: Path, storage_dir: Path, temp_dir: Path) -> List[PdfImportResult]:
-    """Process all PDFs within ``pdf_dir`` and return the extracted data."""
 
-    results: List[PdfImportResult] = []
-    for pdf_path in _iter_pdf_files(pdf_dir):
-        results.append(process_pdf(pdf_path, storage_dir=storage_dir, temp_dir=temp_dir))
-    return results
+def persist_import_results(
+    connection: sqlite3.Connection,
+    results: Iterable[PdfImportResult],
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> None:
+    """Persist the provided import results into the database.
+
+    ``results`` is consumed lazily and written in batches of ``batch_size``,
+    each inside its own explicit ``BEGIN IMMEDIATE``/``COMMIT`` transaction,
+    so memory stays bounded while fsyncs are still amortised over many PDFs.
+    The connection is expected to be in autocommit mode
+    (``isolation_level=None``) so the sqlite3 module adds no transaction
+    statements of its own.
+    """
+
+    now = dt.datetime.utcnow().isoformat()
+    known = _load_known_processes(connection)
+    for batch in _chunked(results, batch_size):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            _persist_batch(connection, batch, known, now)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+
+def load_pdf_results(pdf_dir: Path, storage_dir: Path) -> Iterator[PdfImportResult]:
+    """Process all PDFs within ``pdf_dir`` and yield the extracted data.
+
+    The PDFs are converted in parallel using a pool of worker processes.
+    A sliding window keeps about ``IMPORT_BATCH_SIZE`` conversions in
+    flight: one is submitted as each result is yielded, in order. Memory
+    stays bounded while the pool keeps working during database writes.
+    """
+
+    pending: Deque[Future[PdfImportResult]] = deque()
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        try:
+            for pdf_path in _iter_pdf_files(pdf_dir):
+                pending.append(executor.submit(process_pdf, pdf_path, storage_dir))
+                if len(pending) >= IMPORT_BATCH_SIZE:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Do not keep converting PDFs nobody will consume.
+            for future in pending:
+                future.cancel()
 
 
 def build_database(source_dir: Path, database_path: Path) -> None:
     """Entry point for building the database from ``source_dir``."""
 
     storage_dir = database_path.parent / "pdfs"
-    temp_dir = database_path.parent / "tmp"
+    # Results are produced lazily, so create the database's directory
+    # (via the storage directory) before connecting.
+    storage_dir.mkdir(parents=True, exist_ok=True)
 
-    results = load_pdf_results(source_dir, storage_dir, temp_dir)
+    results = load_pdf_results(source_dir, storage_dir)
 
-    connection = sqlite3.connect(database_path)
+    connection = sqlite3.connect(database_path, isolation_level=None)
     try:
+        configure_connection(connection)
         ensure_schema(connection)
         persist_import_results(connection, results)
     finally: